@@ -0,0 +1,12 @@
+from typing import Any
+
+from hatchet_sdk.runnables.workflow import BaseWorkflow
+from pydantic import BaseModel
+
+from agents import twitter
+
+# Each agent package lists its own workflows and response models; the worker
+# registers everything from here instead of importing tasks one by one.
+ALL_WORKFLOWS: list[BaseWorkflow[Any]] = [*twitter.WORKFLOWS]
+
+ALL_RESPONSE_MODELS: list[type[BaseModel]] = [*twitter.RESPONSE_MODELS]
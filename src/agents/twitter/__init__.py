@@ -0,0 +1,29 @@
+from typing import Any
+
+from hatchet_sdk.runnables.workflow import BaseWorkflow
+from pydantic import BaseModel
+
+from agents.twitter.tools.batch_compose import batch_compose, submit_compose_batch
+from agents.twitter.tools.compose_and_judge import (
+    ComposeAndJudgeResponse,
+    compose_and_judge,
+)
+from agents.twitter.tools.compose_tweet import ComposeTweetResponse, compose_tweet
+from agents.twitter.tools.judge_tweet import JudgeTweetBatchResponse, judge_tweet
+from agents.twitter.twitter_agent import twitter_agent, twitter_batch_agent
+
+WORKFLOWS: list[BaseWorkflow[Any]] = [
+    compose_tweet,
+    compose_and_judge,
+    judge_tweet,
+    submit_compose_batch,
+    batch_compose,
+    twitter_agent,
+    twitter_batch_agent,
+]
+
+RESPONSE_MODELS: list[type[BaseModel]] = [
+    ComposeTweetResponse,
+    ComposeAndJudgeResponse,
+    JudgeTweetBatchResponse,
+]
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from hatchet_sdk import Context, DurableContext
+from pydantic import BaseModel, Field
+
+from agents.twitter.tools.compose_and_judge import (
+    PROMPT_CACHE_KEY,
+    SYSTEM_PROMPT,
+    USER_PROMPT_INSTRUCTIONS,
+    ComposeAndJudgeResponse,
+    apply_hard_limits,
+)
+from agents.twitter.tools.compose_tweet import ComposeTweetInput, format_compose_request
+from common.batch import (
+    BATCH_FAILED_STATUSES,
+    batch_request_line,
+    batch_results,
+    submit_batch,
+)
+from common.dependencies import OpenAIDependency
+from hatchet_client import hatchet
+
+POLL_INITIAL_INTERVAL = timedelta(seconds=30)
+POLL_MAX_INTERVAL = timedelta(minutes=10)
+
+SUBMIT_TIMEOUT = timedelta(minutes=5)
+
+# OpenAI's 24h completion window, plus room for the submission and for the
+# last poll landing up to POLL_MAX_INTERVAL after the batch finishes.
+BATCH_COMPOSE_TIMEOUT = timedelta(hours=24) + SUBMIT_TIMEOUT + POLL_MAX_INTERVAL
+
+
+class BatchComposeInput(BaseModel):
+    requests: list[ComposeTweetInput] = Field(
+        ...,
+        min_length=1,
+        description="Tweets to compose and self-review through the OpenAI Batch API.",
+    )
+
+
+class BatchComposeResponse(BaseModel):
+    results: list[ComposeAndJudgeResponse]
+
+
+class SubmittedBatch(BaseModel):
+    batch_id: str
+
+
+# Uploading and creating a batch is a paid side effect, so it runs as a child
+# task: when the durable parent is replayed or retried, Hatchet hands back the
+# existing child run instead of submitting a second batch.
+@hatchet.task(
+    name="twitter.submit-compose-batch",
+    input_validator=BatchComposeInput,
+    execution_timeout=SUBMIT_TIMEOUT,
+)
+async def submit_compose_batch(
+    input: BatchComposeInput, _ctx: Context, openai: OpenAIDependency
+) -> SubmittedBatch:
+    batch = await submit_batch(
+        openai,
+        [
+            batch_request_line(
+                custom_id=str(i),
+                response_model=ComposeAndJudgeResponse,
+                system_prompt=SYSTEM_PROMPT,
+                stable_context=USER_PROMPT_INSTRUCTIONS,
+                dynamic_suffix=format_compose_request(request),
+                seed=request.seed,
+                prompt_cache_key=PROMPT_CACHE_KEY,
+            )
+            for i, request in enumerate(input.requests)
+        ],
+    )
+
+    return SubmittedBatch(batch_id=batch.id)
+
+
+# Batches complete within OpenAI's 24h window at half the per-token price and
+# against a separate rate-limit pool, so this is for non-interactive runs only.
+@hatchet.durable_task(
+    name="twitter.batch-compose",
+    input_validator=BatchComposeInput,
+    execution_timeout=BATCH_COMPOSE_TIMEOUT,
+)
+async def batch_compose(
+    input: BatchComposeInput, ctx: DurableContext, openai: OpenAIDependency
+) -> BatchComposeResponse:
+    submitted = await submit_compose_batch.aio_run(input)
+    batch = await openai.batches.retrieve(submitted.batch_id)
+    ctx.log(f"Submitted batch {batch.id} with {len(input.requests)} requests")
+
+    interval = POLL_INITIAL_INTERVAL
+
+    while batch.status != "completed":
+        if batch.status in BATCH_FAILED_STATUSES:
+            raise ValueError(f"Batch {batch.id} ended with status {batch.status}")
+
+        # Durable sleeps release the worker slot between polls.
+        await ctx.aio_sleep_for(interval)
+        interval = min(interval * 2, POLL_MAX_INTERVAL)
+        batch = await openai.batches.retrieve(batch.id)
+
+    results = await batch_results(openai, batch, ComposeAndJudgeResponse)
+
+    if len(results) != len(input.requests):
+        raise ValueError(
+            f"Batch {batch.id} returned {len(results)} of {len(input.requests)} results"
+        )
+
+    return BatchComposeResponse(
+        results=[apply_hard_limits(results[str(i)]) for i in range(len(input.requests))]
+    )
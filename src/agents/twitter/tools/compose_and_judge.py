@@ -0,0 +1,82 @@
+from typing import Any
+
+from hatchet_sdk import Context
+from pydantic import BaseModel
+
+from agents.twitter.tools.compose_tweet import (
+    ComposeTweetInput,
+    Hashtags,
+    format_compose_request,
+)
+from agents.twitter.tools.judge_tweet import precheck_tweet
+from common.dependencies import OpenAIDependency
+from common.llm import generate
+from hatchet_client import hatchet
+
+SYSTEM_PROMPT = (
+    "You are an expert Twitter/X copywriter who is also a meticulous social media editor. "
+    "First craft a concise post that stays within the 280-character limit, uses a strong hook, "
+    "and matches the specified tone. Keep the language conversational, avoid excessive emojis, "
+    "and ensure any line breaks are purposeful. Then assess your own draft for publish readiness, "
+    "considering clarity, engagement, brand safety, length limits, and tone."
+)
+
+PROMPT_CACHE_KEY = "twitter.compose-and-judge"
+
+USER_PROMPT_INSTRUCTIONS = (
+    "Requirements: Include up to three relevant hashtags separated by spaces at the end of the tweet.\n"
+    "After writing the tweet, review it and decide if it should be published as-is. "
+    "Set should_publish=true only when no changes are required. "
+    "If changes are needed, set should_publish=false and give concise, actionable feedback "
+    "focused on how to improve the tweet.\n"
+    "Return the result as a JSON object with keys `tweet`, `hashtags`, `should_publish` and `feedback`."
+)
+
+
+class ComposeAndJudgeResponse(BaseModel):
+    tweet: str
+    hashtags: Hashtags
+    should_publish: bool
+    feedback: str
+
+
+def apply_hard_limits(response: ComposeAndJudgeResponse) -> ComposeAndJudgeResponse:
+    # The model grading its own draft can miss hard limits, so the same
+    # deterministic checks as judge_tweet still apply.
+    if response.should_publish and (rejection := precheck_tweet(response.tweet)):
+        response.should_publish = False
+        response.feedback = rejection.feedback
+
+    return response
+
+
+def _approved_early(complete: dict[str, Any]) -> ComposeAndJudgeResponse | None:
+    # Feedback is only read when a draft is rejected, so an approval can stop
+    # the stream before the model writes it.
+    if complete.get("should_publish") is not True:
+        return None
+
+    if "tweet" not in complete or "hashtags" not in complete:
+        return None
+
+    return ComposeAndJudgeResponse.model_validate({**complete, "feedback": ""})
+
+
+@hatchet.task(name="twitter.compose-and-judge", input_validator=ComposeTweetInput)
+async def compose_and_judge(
+    input: ComposeTweetInput,
+    _ctx: Context,
+    openai: OpenAIDependency,
+) -> ComposeAndJudgeResponse:
+    response = await generate(
+        openai=openai,
+        response_model=ComposeAndJudgeResponse,
+        system_prompt=SYSTEM_PROMPT,
+        stable_context=USER_PROMPT_INSTRUCTIONS,
+        dynamic_suffix=format_compose_request(input),
+        seed=input.seed,
+        prompt_cache_key=PROMPT_CACHE_KEY,
+        early_exit=_approved_early,
+    )
+
+    return apply_hard_limits(response)
@@ -1,5 +1,7 @@
+from typing import Annotated
+
 from hatchet_sdk import ConcurrencyExpression, ConcurrencyLimitStrategy, Context
-from pydantic import BaseModel, Field
+from pydantic import AfterValidator, BaseModel, Field
 
 from common.dependencies import OpenAIDependency
 from common.llm import generate
@@ -17,6 +19,25 @@ SYSTEM_PROMPT = (
     "language conversational, avoid excessive emojis, and ensure any line breaks are purposeful."
 )
 
+PROMPT_CACHE_KEY = "twitter.compose-tweet"
+
+USER_PROMPT_INSTRUCTIONS = (
+    "Requirements: Include up to three relevant hashtags separated by spaces at the end of the tweet.\n"
+    "Return the result as a JSON object with keys `tweet` and `hashtags`."
+)
+
+MAX_HASHTAG_LENGTH = 100
+
+
+def clean_hashtags(hashtags: list[str]) -> list[str]:
+    # Strip each tag once, drop empty or runaway entries, and normalize to a
+    # single leading "#" so downstream code can print them as-is.
+    stripped = (tag.strip().lstrip("#") for tag in hashtags)
+    return [f"#{tag}" for tag in stripped if 0 < len(tag) <= MAX_HASHTAG_LENGTH]
+
+
+Hashtags = Annotated[list[str], AfterValidator(clean_hashtags)]
+
 
 class ComposeTweetInput(BaseModel):
     prompt: str = Field(..., description="Core idea or instructions for the tweet.")
@@ -31,10 +52,23 @@ class ComposeTweetInput(BaseModel):
         description="Optional prior tweet text to revise based on feedback.",
     )
 
+    seed: int | None = Field(
+        default=None,
+        description="Optional sampling seed; give parallel candidates distinct seeds.",
+    )
+
 
 class ComposeTweetResponse(BaseModel):
     tweet: str
-    hashtags: list[str]
+    hashtags: Hashtags
+
+
+def format_compose_request(input: ComposeTweetInput) -> str:
+    return (
+        f"Compose a tweet/X post about: {input.prompt}\n"
+        f"You've previously received the following feedback on the last iteration of the tweet: {input.previous_feedback}\n"
+        f"The last iteration of the tweet was: {input.previous_tweet}"
+    )
 
 
 @hatchet.task(name="twitter.compose-tweet", input_validator=ComposeTweetInput)
@@ -43,19 +77,12 @@ async def compose_tweet(
     _ctx: Context,
     openai: OpenAIDependency,
 ) -> ComposeTweetResponse:
-    hashtag_instruction = "Include up to three relevant hashtags separated by spaces at the end of the tweet."
-
-    user_prompt = (
-        f"Compose a tweet/X post about: {input.prompt}\n"
-        f"Requirements: {hashtag_instruction}\n"
-        "Return the result as a JSON object with keys `tweet` and `hashtags`.\n"
-        f"You've previously received the following feedback on the last iteration of the tweet: {input.previous_feedback}\n"
-        f"The last iteration of the tweet was: {input.previous_tweet}"
-    )
-
     return await generate(
         openai=openai,
         response_model=ComposeTweetResponse,
         system_prompt=SYSTEM_PROMPT,
-        user_prompt=user_prompt,
+        stable_context=USER_PROMPT_INSTRUCTIONS,
+        dynamic_suffix=format_compose_request(input),
+        seed=input.seed,
+        prompt_cache_key=PROMPT_CACHE_KEY,
     )
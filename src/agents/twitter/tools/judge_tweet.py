@@ -1,20 +1,49 @@
+import re
+
 from hatchet_sdk import Context
+from openai import AsyncOpenAI
 from pydantic import BaseModel, Field
 
 from common.dependencies import OpenAIDependency
 from common.llm import generate
 from hatchet_client import hatchet
 
+# The whole rubric lives in the system prompt so the user message carries little
+# more than the tweets, keeping the cacheable prefix identical across calls.
 SYSTEM_PROMPT = (
     "You are a meticulous social media editor specializing in Twitter/X. "
-    "Assess the provided tweet for publish readiness, considering clarity, engagement, "
-    "brand safety, length limits, and tone."
+    "Assess the provided tweets for publish readiness, considering clarity, engagement, "
+    "brand safety, length limits, and tone.\n"
+    "Review each of the numbered tweets and decide if it should be published as-is. "
+    "Respond with should_publish=true only when no changes are required. "
+    "If changes are needed, set should_publish=false and give concise, actionable feedback "
+    "focused on how to improve the tweet.\n"
+    "Return a JSON object with a `results` list containing exactly one entry per tweet, "
+    "in the same order as the tweets are numbered."
 )
 
+USER_PROMPT_INSTRUCTIONS = "Review the following tweets."
+
+PROMPT_CACHE_KEY = "twitter.judge-tweet"
+
+# Judging is a short classification, so a smaller, faster tier is enough.
+JUDGE_MODEL = "gpt-4.1-nano"
+
+# Per-call latency grows with the number of tweets judged together, so keep
+# batches small.
+MAX_TWEETS_PER_BATCH = 8
+
+MAX_TWEET_LENGTH = 280
+
+_CONTROL_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
 
 class JudgeTweetInput(BaseModel):
-    tweet: str = Field(
-        ..., description="Tweet text that needs to be evaluated before publishing."
+    tweets: list[str] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_TWEETS_PER_BATCH,
+        description="Tweet texts that need to be evaluated before publishing.",
     )
 
 
@@ -23,21 +52,70 @@ class JudgeTweetResponse(BaseModel):
     feedback: str
 
 
-@hatchet.task(name="twitter.judge-tweet", input_validator=JudgeTweetInput)
-async def judge_tweet(
-    input: JudgeTweetInput, _ctx: Context, openai: OpenAIDependency
-) -> JudgeTweetResponse:
-    user_prompt = (
-        "Review the following tweet and decide if it should be published as-is.\n\n"
-        f"Tweet:\n{input.tweet}\n\n"
-        "Respond with should_publish=true only when no changes are required. "
-        "If changes are needed, set should_publish=false and give concise, actionable feedback "
-        "focused on how to improve the tweet."
+class JudgeTweetBatchResponse(BaseModel):
+    results: list[JudgeTweetResponse]
+
+
+def precheck_tweet(tweet: str) -> JudgeTweetResponse | None:
+    # Cheap deterministic rejections that don't need an LLM call.
+    text = tweet.strip()
+
+    if not text:
+        return JudgeTweetResponse(should_publish=False, feedback="Tweet is empty.")
+
+    if len(text) > MAX_TWEET_LENGTH:
+        return JudgeTweetResponse(
+            should_publish=False,
+            feedback=f"Tweet is {len(text)} characters long; shorten it to at most {MAX_TWEET_LENGTH}.",
+        )
+
+    if _CONTROL_CHARS_RE.search(text):
+        return JudgeTweetResponse(
+            should_publish=False,
+            feedback="Tweet contains control characters; remove them.",
+        )
+
+    return None
+
+
+async def _review(openai: AsyncOpenAI, tweets: list[str]) -> list[JudgeTweetResponse]:
+    numbered_tweets = "\n\n".join(
+        f"Tweet {i}:\n{tweet}" for i, tweet in enumerate(tweets, start=1)
     )
 
-    return await generate(
+    response = await generate(
         openai=openai,
-        response_model=JudgeTweetResponse,
+        response_model=JudgeTweetBatchResponse,
         system_prompt=SYSTEM_PROMPT,
-        user_prompt=user_prompt,
+        stable_context=USER_PROMPT_INSTRUCTIONS,
+        dynamic_suffix=numbered_tweets,
+        prompt_cache_key=PROMPT_CACHE_KEY,
+        model=JUDGE_MODEL,
+    )
+
+    if len(response.results) != len(tweets):
+        raise ValueError(
+            f"Expected {len(tweets)} judgements, got {len(response.results)}"
+        )
+
+    return response.results
+
+
+@hatchet.task(name="twitter.judge-tweet", input_validator=JudgeTweetInput)
+async def judge_tweet(
+    input: JudgeTweetInput, _ctx: Context, openai: OpenAIDependency
+) -> JudgeTweetBatchResponse:
+    prechecked = [precheck_tweet(tweet) for tweet in input.tweets]
+    to_review = [
+        tweet
+        for tweet, result in zip(input.tweets, prechecked, strict=True)
+        if result is None
+    ]
+
+    reviewed = iter(await _review(openai, to_review) if to_review else [])
+
+    return JudgeTweetBatchResponse(
+        results=[
+            result if result is not None else next(reviewed) for result in prechecked
+        ]
     )
@@ -1,16 +1,30 @@
+import asyncio
+import hashlib
+from collections.abc import Awaitable, Callable
+
 from hatchet_sdk import DurableContext
 from pydantic import BaseModel
 
-from agents.twitter.tools.compose_tweet import (
-    ComposeTweetInput,
-    compose_tweet,
+from agents.twitter.tools.batch_compose import (
+    BATCH_COMPOSE_TIMEOUT,
+    BatchComposeInput,
+    batch_compose,
 )
-from agents.twitter.tools.judge_tweet import (
-    JudgeTweetInput,
-    judge_tweet,
+from agents.twitter.tools.compose_and_judge import (
+    ComposeAndJudgeResponse,
+    compose_and_judge,
 )
+from agents.twitter.tools.compose_tweet import ComposeTweetInput
 from hatchet_client import hatchet
 
+# Each round composes and self-reviews several candidates concurrently, so
+# fewer rounds are needed than with one candidate at a time.
+CANDIDATES_PER_ROUND = 3
+MAX_ROUNDS = 2
+
+# Batch rounds can each take up to OpenAI's 24h completion window.
+BATCH_AGENT_TIMEOUT = BATCH_COMPOSE_TIMEOUT * MAX_ROUNDS
+
 
 class TwitterAgentInput(BaseModel):
     message: str
@@ -24,32 +38,140 @@ class TwitterAgentOutput(BaseModel):
         return f"Tweet: {self.tweet}\nHashtags: {' '.join(self.hashtags)}"
 
 
-@hatchet.durable_task(name="twitter.twitter_agent", input_validator=TwitterAgentInput)
-async def twitter_agent(
-    input: TwitterAgentInput, ctx: DurableContext
-) -> TwitterAgentOutput | None:
+def _candidate_seed(run_id: str, index: int) -> int:
+    # Seeds only have to differ between candidates of a run (so they aren't
+    # coalesced into one request) and between runs: fixed seeds would have
+    # OpenAI reproduce the same samples for every run with the same message.
+    digest = hashlib.blake2b(f"{run_id}:{index}".encode(), digest_size=4).digest()
+    return int.from_bytes(digest, "big")
+
+
+# A round returns the first approved candidate and the first rejected one.
+RoundResult = tuple[ComposeAndJudgeResponse | None, ComposeAndJudgeResponse | None]
+RoundRunner = Callable[
+    [DurableContext, list[ComposeTweetInput]], Awaitable[RoundResult]
+]
+
+
+async def _realtime_round(
+    ctx: DurableContext, candidates: list[ComposeTweetInput]
+) -> RoundResult:
+    refs = await asyncio.gather(
+        *[
+            compose_and_judge.aio_run_no_wait(input=candidate)
+            for candidate in candidates
+        ]
+    )
+    pending = {asyncio.ensure_future(ref.aio_result()): ref for ref in refs}
+    rejected: ComposeAndJudgeResponse | None = None
+    errors: list[BaseException] = []
+
+    try:
+        # Take candidates in the order they finish so an early approval
+        # doesn't wait on slower siblings.
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            finished: list[ComposeAndJudgeResponse] = []
+
+            for task in done:
+                del pending[task]
+
+                # A failed candidate counts as missing instead of failing the
+                # round while its siblings may still be approved.
+                if (error := task.exception()) is not None:
+                    ctx.log(f"Candidate failed: {error!r}")
+                    errors.append(error)
+                else:
+                    finished.append(task.result())
+
+            for candidate in finished:
+                if candidate.should_publish:
+                    return candidate, rejected
+
+                rejected = rejected or candidate
+    finally:
+        # Stop paying for candidates nobody will read, and join the
+        # cancelled waiters so none outlive the round.
+        for task in pending:
+            task.cancel()
+
+        await asyncio.gather(
+            *pending,
+            *[hatchet.runs.aio_cancel(ref.workflow_run_id) for ref in pending.values()],
+            return_exceptions=True,
+        )
+
+    if len(errors) == len(refs):
+        raise errors[0]
+
+    return None, rejected
+
+
+async def _batch_round(
+    _ctx: DurableContext, candidates: list[ComposeTweetInput]
+) -> RoundResult:
+    response = await batch_compose.aio_run(BatchComposeInput(requests=candidates))
+    approved = next((c for c in response.results if c.should_publish), None)
+    rejected = next((c for c in response.results if not c.should_publish), None)
+
+    return approved, rejected
+
+
+async def _run_agent(
+    input: TwitterAgentInput, ctx: DurableContext, run_round: RoundRunner
+) -> TwitterAgentOutput:
     ctx.log(f"Twitter agent received input: {input}")
     previous_tweet: str | None = None
     previous_feedback: str | None = None
 
-    for _ in range(3):
-        tweet = await compose_tweet.aio_run(
-            input=ComposeTweetInput(
-                prompt=input.message,
-                previous_feedback=previous_feedback,
-                previous_tweet=previous_tweet,
-            )
+    for _ in range(MAX_ROUNDS):
+        approved, rejected = await run_round(
+            ctx,
+            [
+                ComposeTweetInput(
+                    prompt=input.message,
+                    previous_feedback=previous_feedback,
+                    previous_tweet=previous_tweet,
+                    seed=_candidate_seed(ctx.workflow_run_id, index),
+                )
+                for index in range(CANDIDATES_PER_ROUND)
+            ],
         )
-        judge_tweet_result = await judge_tweet.aio_run(
-            input=JudgeTweetInput(tweet=tweet.tweet)
-        )
-
-        previous_feedback = judge_tweet_result.feedback
-        previous_tweet = tweet.tweet
 
-        if judge_tweet_result.should_publish:
+        if approved is not None:
             # await ctx.aio_wait_for("tweet:approved", )
 
-            return TwitterAgentOutput(tweet=tweet.tweet, hashtags=tweet.hashtags)
+            # Both fields were validated on the ComposeAndJudgeResponse already.
+            return TwitterAgentOutput.model_construct(
+                tweet=approved.tweet, hashtags=approved.hashtags
+            )
+
+        # No candidate was approved, so revise the first one rejected using its
+        # feedback.
+        if rejected is not None:
+            previous_tweet = rejected.tweet
+            previous_feedback = rejected.feedback
 
     raise ValueError("Failed to generate a tweet")
+
+
+@hatchet.durable_task(name="twitter.twitter_agent", input_validator=TwitterAgentInput)
+async def twitter_agent(
+    input: TwitterAgentInput, ctx: DurableContext
+) -> TwitterAgentOutput | None:
+    return await _run_agent(input, ctx, _realtime_round)
+
+
+# Bulk runs that can wait trade latency for the Batch API's lower price and
+# separate rate limits. They get their own task so interactive runs keep the
+# default execution timeout.
+@hatchet.durable_task(
+    name="twitter.batch-agent",
+    input_validator=TwitterAgentInput,
+    execution_timeout=BATCH_AGENT_TIMEOUT,
+)
+async def twitter_batch_agent(
+    input: TwitterAgentInput, ctx: DurableContext
+) -> TwitterAgentOutput | None:
+    return await _run_agent(input, ctx, _batch_round)
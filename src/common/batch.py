@@ -0,0 +1,80 @@
+import json
+from typing import Any, Final
+
+from openai import AsyncOpenAI
+from openai.types import Batch
+from openai.types.chat import ChatCompletion
+from pydantic import BaseModel
+
+from .llm import completion_params
+from .response import T, response_to_pydantic
+
+BATCH_ENDPOINT: Final = "/v1/chat/completions"
+
+# Statuses after which a batch will never produce (more) output.
+BATCH_FAILED_STATUSES = frozenset({"failed", "expired", "cancelled"})
+
+
+def batch_request_line(
+    custom_id: str,
+    response_model: type[BaseModel],
+    system_prompt: str,
+    stable_context: str,
+    dynamic_suffix: str,
+    seed: int | None = None,
+    prompt_cache_key: str | None = None,
+) -> dict[str, Any]:
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": completion_params(
+            response_model,
+            system_prompt,
+            stable_context,
+            dynamic_suffix,
+            seed,
+            prompt_cache_key,
+        ),
+    }
+
+
+async def submit_batch(openai: AsyncOpenAI, lines: list[dict[str, Any]]) -> Batch:
+    payload = "".join(json.dumps(line) + "\n" for line in lines).encode()
+
+    input_file = await openai.files.create(
+        file=("batch.jsonl", payload), purpose="batch"
+    )
+
+    return await openai.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+    )
+
+
+async def batch_results(
+    openai: AsyncOpenAI, batch: Batch, response_model: type[T]
+) -> dict[str, T]:
+    if not batch.output_file_id:
+        raise ValueError(f"Batch {batch.id} has no output file.")
+
+    output = await openai.files.content(batch.output_file_id)
+    results: dict[str, T] = {}
+
+    for line in output.text.splitlines():
+        if not line:
+            continue
+
+        entry = json.loads(line)
+        response = entry.get("response")
+
+        # Failed requests are reported in the batch's error file; callers
+        # detect them as missing custom ids.
+        if entry.get("error") or not response or response["status_code"] != 200:
+            continue
+
+        completion = ChatCompletion.model_validate(response["body"])
+        results[entry["custom_id"]] = response_to_pydantic(completion, response_model)
+
+    return results
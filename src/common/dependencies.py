@@ -1,11 +1,44 @@
+import asyncio
 from typing import Annotated, Any
+from weakref import WeakKeyDictionary
 
+import httpx
 from hatchet_sdk import Depends
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+# httpx connection pools are bound to the event loop that opened them, so
+# keep one client per loop; entries go away with their loop.
+_clients: WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI] = (
+    WeakKeyDictionary()
+)
+
+
+def get_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+
+    if client is None:
+        client = AsyncOpenAI(
+            max_retries=2,
+            timeout=30.0,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+            ),
+        )
+        _clients[loop] = client
+
+    return client
+
+
+async def close_client() -> None:
+    client = _clients.pop(asyncio.get_running_loop(), None)
+
+    if client is not None:
+        await client.close()
 
 
 async def openai_client(_i: Any, _c: Any) -> AsyncOpenAI:
-    return AsyncOpenAI()
+    return get_client()
 
 
 OpenAIDependency = Annotated[AsyncOpenAI, Depends(openai_client)]
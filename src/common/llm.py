@@ -1,31 +1,374 @@
-from openai import AsyncOpenAI
+import asyncio
+import hashlib
+import logging
+import os
+from collections.abc import Callable, Iterable, Mapping
+from functools import cache
+from types import TracebackType
+from typing import Any, cast
+from weakref import WeakKeyDictionary
 
-from .response import T, response_to_pydantic
+from openai import APIStatusError, AsyncOpenAI
+from openai.types.shared_params import ResponseFormatJSONSchema
+from pydantic import BaseModel
+from pydantic_core import from_json
 
+from .response import T, content_to_pydantic, response_to_pydantic
 
-async def generate(
-    openai: AsyncOpenAI, response_model: type[T], system_prompt: str, user_prompt: str
-) -> T:
-    completion = await openai.chat.completions.create(
-        model="gpt-4o-mini",
-        temperature=0.80,
-        response_format={
-            "type": "json_schema",
-            "json_schema": {
-                "name": response_model.__name__,
-                "schema": response_model.model_json_schema(),
-            },
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_TEMPERATURE = 0.80
+
+WARM_UP_TIMEOUT_SECONDS = 5.0
+
+# Given the fields of a streamed response that are known to be complete,
+# returns the final result if the caller no longer needs the rest.
+EarlyExit = Callable[[dict[str, Any]], T | None]
+
+
+class _AdaptiveLimiter:
+    # Caps in-flight completions per worker so bursts of task runs queue
+    # locally instead of tripping OpenAI's rate limits. The cap halves on a
+    # 429 or when the rate-limit headers show the request budget running out,
+    # and grows back by one slot per healthy response.
+
+    def __init__(self, limit: int, floor: int, low_watermark: int) -> None:
+        self._max_limit = limit
+        self._limit = limit
+        self._floor = floor
+        self._low_watermark = low_watermark
+        self._active = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._active < self._limit)
+            self._active += 1
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        async with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+        # Error responses carry the rate-limit headers too, and a 429 that
+        # outlasted the SDK's own retries is the strongest signal to back off.
+        if isinstance(exc, APIStatusError):
+            await self.observe(
+                exc.response.headers, rate_limited=exc.status_code == 429
+            )
+
+    async def observe(
+        self, headers: Mapping[str, str], rate_limited: bool = False
+    ) -> None:
+        try:
+            remaining = int(headers["x-ratelimit-remaining-requests"])
+        except (KeyError, ValueError):
+            if not rate_limited:
+                return
+
+            remaining = 0
+
+        async with self._condition:
+            if rate_limited or remaining < self._low_watermark:
+                self._limit = max(self._floor, self._limit // 2)
+            elif self._limit < self._max_limit:
+                self._limit += 1
+                self._condition.notify()
+
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "50"))
+
+# The limiter's condition and the in-flight tasks are bound to the event loop
+# that created them, so like the clients in common.dependencies they are kept
+# per loop; entries go away with their loop.
+_limiters: WeakKeyDictionary[asyncio.AbstractEventLoop, _AdaptiveLimiter] = (
+    WeakKeyDictionary()
+)
+
+# Identical requests that are already in flight on this worker share one
+# completion instead of each paying for their own. Each shared completion
+# counts its callers so it can be cancelled once none of them are left.
+_inflight: WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[str, asyncio.Task[Any]]
+] = WeakKeyDictionary()
+_waiters: dict[asyncio.Task[Any], int] = {}
+
+
+def _get_limiter() -> _AdaptiveLimiter:
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+
+    if limiter is None:
+        limiter = _AdaptiveLimiter(limit=LLM_MAX_CONCURRENCY, floor=4, low_watermark=5)
+        _limiters[loop] = limiter
+
+    return limiter
+
+
+def _get_inflight() -> dict[str, asyncio.Task[Any]]:
+    loop = asyncio.get_running_loop()
+    inflight = _inflight.get(loop)
+
+    if inflight is None:
+        inflight = {}
+        _inflight[loop] = inflight
+
+    return inflight
+
+
+def _strip_titles(node: Any) -> Any:
+    # Pydantic adds a "title" to every model and field. The model never needs
+    # them, so dropping them shrinks every request; keys under "properties" are
+    # field names, not keywords, and are kept even if a field is called "title".
+    if isinstance(node, list):
+        return [_strip_titles(item) for item in node]
+
+    if not isinstance(node, dict):
+        return node
+
+    return {
+        key: (
+            {name: _strip_titles(value) for name, value in child.items()}
+            if key in ("properties", "$defs")
+            else _strip_titles(child)
+        )
+        for key, child in node.items()
+        if key != "title"
+    }
+
+
+# Response models are static, so each JSON schema is built once per process.
+@cache
+def _schema_for(model: type[BaseModel]) -> dict[str, Any]:
+    schema: dict[str, Any] = _strip_titles(model.model_json_schema())
+    return schema
+
+
+@cache
+def _response_format_for(model: type[BaseModel]) -> ResponseFormatJSONSchema:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": _schema_for(model),
         },
-        messages=[
+    }
+
+
+def _request_key(
+    response_model: type[BaseModel],
+    system_prompt: str,
+    user_prompt: str,
+    seed: int | None,
+    model: str,
+    temperature: float,
+) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    parts = (
+        response_model.__name__,
+        system_prompt,
+        user_prompt,
+        str(seed),
+        model,
+        str(temperature),
+    )
+
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+def build_user_prompt(stable_context: str, dynamic_suffix: str) -> str:
+    # Per-call content always goes last, after a fixed separator, so the
+    # instructions before it form a prefix that is identical across calls and
+    # is matched by OpenAI's automatic prompt caching.
+    return f"{stable_context}\n\n---\n{dynamic_suffix}"
+
+
+def completion_params(
+    response_model: type[BaseModel],
+    system_prompt: str,
+    stable_context: str,
+    dynamic_suffix: str,
+    seed: int | None = None,
+    prompt_cache_key: str | None = None,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+) -> dict[str, Any]:
+    # Shared by the realtime path and Batch API request lines so both send
+    # byte-identical request bodies. The system prompt always leads so the
+    # static prefix is what OpenAI's automatic prompt cache matches on.
+    params: dict[str, Any] = {
+        "model": model,
+        "temperature": temperature,
+        "response_format": _response_format_for(response_model),
+        "messages": [
             {
                 "role": "system",
                 "content": system_prompt,
             },
             {
                 "role": "user",
-                "content": user_prompt,
+                "content": build_user_prompt(stable_context, dynamic_suffix),
             },
         ],
+    }
+
+    if seed is not None:
+        params["seed"] = seed
+
+    # Requests sharing a key are routed to the same cache shard, which keeps
+    # hit rates up when many workers send the same prefix.
+    if prompt_cache_key is not None:
+        params["prompt_cache_key"] = prompt_cache_key
+
+    return params
+
+
+async def _complete(
+    openai: AsyncOpenAI, response_model: type[T], params: dict[str, Any]
+) -> T:
+    limiter = _get_limiter()
+
+    async with limiter:
+        raw = await openai.chat.completions.with_raw_response.create(**params)
+        await limiter.observe(raw.headers)
+
+    return response_to_pydantic(raw.parse(), response_model)
+
+
+async def _stream_complete(
+    openai: AsyncOpenAI,
+    response_model: type[T],
+    params: dict[str, Any],
+    early_exit: EarlyExit[T],
+) -> T:
+    content = ""
+    limiter = _get_limiter()
+
+    async with limiter:
+        raw = await openai.chat.completions.with_raw_response.create(
+            **params, stream=True
+        )
+        await limiter.observe(raw.headers)
+
+        async with raw.parse() as stream:
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+
+                content += chunk.choices[0].delta.content
+
+                try:
+                    partial = from_json(content, allow_partial="trailing-strings")
+                except ValueError:
+                    continue
+
+                if not isinstance(partial, dict) or len(partial) < 2:
+                    continue
+
+                # Only the last key can still be mid-value; every field before
+                # it has been fully streamed.
+                complete = dict(list(partial.items())[:-1])
+
+                if (result := early_exit(complete)) is not None:
+                    # Leaving the context manager closes the response, so the
+                    # remaining tokens are never read.
+                    return result
+
+    return content_to_pydantic(content, response_model)
+
+
+async def generate(
+    openai: AsyncOpenAI,
+    response_model: type[T],
+    system_prompt: str,
+    stable_context: str,
+    dynamic_suffix: str,
+    seed: int | None = None,
+    prompt_cache_key: str | None = None,
+    early_exit: EarlyExit[T] | None = None,
+    model: str = DEFAULT_MODEL,
+    temperature: float = DEFAULT_TEMPERATURE,
+) -> T:
+    key = _request_key(
+        response_model,
+        system_prompt,
+        build_user_prompt(stable_context, dynamic_suffix),
+        seed,
+        model,
+        temperature,
     )
 
-    return response_to_pydantic(completion, response_model)
+    inflight = _get_inflight()
+    task = inflight.get(key)
+
+    if task is None:
+        params = completion_params(
+            response_model,
+            system_prompt,
+            stable_context,
+            dynamic_suffix,
+            seed=seed,
+            prompt_cache_key=prompt_cache_key,
+            model=model,
+            temperature=temperature,
+        )
+
+        # With an early exit the reply is streamed, so the request can stop as
+        # soon as the caller has what it needs.
+        task = asyncio.ensure_future(
+            _complete(openai, response_model, params)
+            if early_exit is None
+            else _stream_complete(openai, response_model, params, early_exit)
+        )
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+
+    # Shielded so one caller being cancelled doesn't fail the others waiting
+    # on the same completion; each caller gets its own copy of the result.
+    _waiters[task] = _waiters.get(task, 0) + 1
+
+    try:
+        result = await asyncio.shield(task)
+    finally:
+        _waiters[task] -= 1
+
+        # The last caller gave up, so stop the request (and the stream, and
+        # the limiter slot) rather than paying for output nobody will read.
+        # It is unregistered first so a new caller starts a fresh request
+        # instead of joining one that is being cancelled.
+        if not _waiters[task]:
+            del _waiters[task]
+
+            if inflight.get(key) is task:
+                del inflight[key]
+
+            task.cancel()
+
+    return cast(T, result.model_copy(deep=True))
+
+
+async def warm_up(
+    openai: AsyncOpenAI, response_models: Iterable[type[BaseModel]]
+) -> None:
+    # Builds the cached response formats and opens a pooled connection so the
+    # first task run after a deploy doesn't pay for either.
+    for response_model in response_models:
+        _response_format_for(response_model)
+
+    # Bounded because the worker doesn't start listening for tasks until the
+    # lifespan yields; an unreachable API must not hold that up for the
+    # client's full timeout and retries.
+    try:
+        await asyncio.wait_for(openai.models.list(), WARM_UP_TIMEOUT_SECONDS)
+    except Exception:
+        logger.warning("OpenAI warm-up request failed", exc_info=True)
@@ -6,10 +6,12 @@ from pydantic import BaseModel
 T = TypeVar("T", bound=BaseModel)
 
 
-def response_to_pydantic(completion: ChatCompletion, model: type[T]) -> T:
-    content = completion.choices[0].message.content
-
+def content_to_pydantic(content: str | None, model: type[T]) -> T:
     if not content:
         raise TypeError("OpenAI returned empty content.")
 
     return model.model_validate_json(content)
+
+
+def response_to_pydantic(completion: ChatCompletion, model: type[T]) -> T:
+    return content_to_pydantic(completion.choices[0].message.content, model)
@@ -1,17 +1,26 @@
-from agents.twitter.tools.compose_tweet import compose_tweet
-from agents.twitter.tools.judge_tweet import judge_tweet
-from agents.twitter.twitter_agent import twitter_agent
+from collections.abc import AsyncGenerator
+
+from agents import ALL_RESPONSE_MODELS, ALL_WORKFLOWS
+from common.dependencies import close_client, get_client
+from common.llm import warm_up
 from hatchet_client import hatchet
 
 
+async def lifespan() -> AsyncGenerator[None, None]:
+    # Runs on the worker's event loop, so this warms the same client the
+    # tasks get from OpenAIDependency.
+    await warm_up(get_client(), ALL_RESPONSE_MODELS)
+
+    yield
+
+    await close_client()
+
+
 def main() -> None:
     worker = hatchet.worker(
         "agent-worker",
-        workflows=[
-            compose_tweet,
-            judge_tweet,
-            twitter_agent,
-        ],
+        workflows=ALL_WORKFLOWS,
+        lifespan=lifespan,
     )
     worker.start()
 
@@ -0,0 +1,216 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator, Awaitable, Callable
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from agents.twitter.tools.compose_and_judge import (
+    ComposeAndJudgeResponse,
+    _approved_early,
+)
+from common.llm import LLM_MAX_CONCURRENCY, generate
+
+
+class FakeStream:
+    def __init__(self, content: str, chunk_size: int) -> None:
+        self.pieces = [
+            content[i : i + chunk_size] for i in range(0, len(content), chunk_size)
+        ]
+        self.read = 0
+
+    async def __aenter__(self) -> "FakeStream":
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        pass
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        for piece in self.pieces:
+            self.read += 1
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))]
+            )
+
+
+def fake_openai(create: Callable[..., Awaitable[Any]]) -> Any:
+    return SimpleNamespace(
+        chat=SimpleNamespace(
+            completions=SimpleNamespace(
+                with_raw_response=SimpleNamespace(create=create)
+            )
+        )
+    )
+
+
+APPROVED = {"tweet": "t", "hashtags": [], "should_publish": True, "feedback": ""}
+
+
+def fake_completion(payload: dict[str, Any]) -> Any:
+    message = SimpleNamespace(content=json.dumps(payload))
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def run(
+    payload: dict[str, Any], chunk_size: int = 1
+) -> tuple[ComposeAndJudgeResponse, FakeStream, list[dict[str, Any]]]:
+    seen: list[dict[str, Any]] = []
+
+    def approved_early(complete: dict[str, Any]) -> ComposeAndJudgeResponse | None:
+        seen.append(complete)
+        return _approved_early(complete)
+
+    stream = FakeStream(json.dumps(payload), chunk_size)
+
+    async def create(**_: Any) -> Any:
+        return SimpleNamespace(headers={}, parse=lambda: stream)
+
+    result = asyncio.run(
+        generate(
+            fake_openai(create),
+            ComposeAndJudgeResponse,
+            system_prompt="system",
+            stable_context="context",
+            dynamic_suffix=json.dumps(payload),
+            early_exit=approved_early,
+        )
+    )
+
+    return result, stream, seen
+
+
+def test_schema_asks_for_should_publish_before_feedback() -> None:
+    # The reply follows the schema's field order; an approval can only stop
+    # the stream early if the verdict comes before the feedback.
+    properties = list(ComposeAndJudgeResponse.model_json_schema()["properties"])
+
+    assert properties == ["tweet", "hashtags", "should_publish", "feedback"]
+
+
+@pytest.mark.parametrize("should_publish", [True, False])
+def test_early_exit_only_sees_fully_streamed_fields(should_publish: bool) -> None:
+    payload = {
+        "tweet": "hello world",
+        "hashtags": ["#pycon", "#python"],
+        "should_publish": should_publish,
+        "feedback": "x" * 50,
+    }
+    _, _, seen = run(payload)
+
+    assert seen
+    for complete in seen:
+        assert complete == dict(list(payload.items())[: len(complete)])
+
+
+def test_approval_stops_the_stream_after_should_publish() -> None:
+    payload = {
+        "tweet": "hello world",
+        "hashtags": ["pycon"],
+        "should_publish": True,
+        "feedback": "x" * 50,
+    }
+    result, stream, seen = run(payload)
+
+    assert result == ComposeAndJudgeResponse(
+        tweet="hello world", hashtags=["#pycon"], should_publish=True, feedback=""
+    )
+    assert seen[-1] == {
+        "tweet": "hello world",
+        "hashtags": ["pycon"],
+        "should_publish": True,
+    }
+    assert stream.read < len(stream.pieces)
+
+
+def test_approval_waits_for_hashtags() -> None:
+    payload = {
+        "tweet": "hello world",
+        "should_publish": True,
+        "hashtags": ["#pycon"],
+        "feedback": "x" * 50,
+    }
+    result, stream, _ = run(payload)
+
+    assert result.hashtags == ["#pycon"]
+    assert result.feedback == ""
+    assert stream.read < len(stream.pieces)
+
+
+def test_rejection_falls_back_to_a_full_parse() -> None:
+    payload = {
+        "tweet": "hello world",
+        "hashtags": ["#pycon"],
+        "should_publish": False,
+        "feedback": "shorter",
+    }
+    result, stream, _ = run(payload, chunk_size=4)
+
+    assert result == ComposeAndJudgeResponse.model_validate(payload)
+    assert stream.read == len(stream.pieces)
+
+
+def test_should_publish_as_the_last_key_falls_back_to_a_full_parse() -> None:
+    payload = {
+        "tweet": "hello world",
+        "hashtags": ["#pycon"],
+        "feedback": "looks good",
+        "should_publish": True,
+    }
+    result, stream, seen = run(payload)
+
+    assert result == ComposeAndJudgeResponse.model_validate(payload)
+    assert stream.read == len(stream.pieces)
+    assert all("should_publish" not in complete for complete in seen)
+
+
+def test_request_after_last_caller_cancelled_starts_fresh() -> None:
+    calls = 0
+
+    async def create(**_: Any) -> Any:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(headers={}, parse=lambda: fake_completion(APPROVED))
+
+    openai = fake_openai(create)
+
+    async def scenario() -> ComposeAndJudgeResponse:
+        first = asyncio.ensure_future(
+            generate(openai, ComposeAndJudgeResponse, "system", "context", "cancelled")
+        )
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0)
+
+        # Sent right after the only caller of the same request was cancelled,
+        # while the shared completion is still being torn down.
+        return await generate(
+            openai, ComposeAndJudgeResponse, "system", "context", "cancelled"
+        )
+
+    assert asyncio.run(scenario()).tweet == "t"
+    assert calls == 2
+
+
+def test_generate_works_across_event_loops() -> None:
+    async def create(**_: Any) -> Any:
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(headers={}, parse=lambda: fake_completion(APPROVED))
+
+    openai = fake_openai(create)
+
+    async def burst() -> list[ComposeAndJudgeResponse]:
+        # More distinct requests than the concurrency cap, so callers queue on
+        # the limiter.
+        return await asyncio.gather(
+            *[
+                generate(
+                    openai, ComposeAndJudgeResponse, "system", "context", f"request {i}"
+                )
+                for i in range(LLM_MAX_CONCURRENCY + 10)
+            ]
+        )
+
+    for _ in range(2):
+        assert len(asyncio.run(burst())) == LLM_MAX_CONCURRENCY + 10